@@ -5,20 +5,29 @@ How to run:
 1. Create a virtualenv and install requirements:
    python -m venv venv
    source venv/bin/activate   # on Windows: venv\Scripts\activate
-   pip install flask
+   pip install -r requirements.txt
 
-2. Run:
+2. Run (local development, single-threaded dev server with reloader):
    python flask_shipping_optimizer.py
 
+   Or serve with gunicorn, one worker process per core (this is what the
+   Procfile runs):
+   gunicorn -w $(nproc) -k gthread --threads 4 --preload -b 127.0.0.1:5000 flask_shipping_optimizer:app
+
+   --preload imports the module once in the master, so the precomputed
+   distance matrix and adjacency arrays, and the numba-compiled search
+   (compiled eagerly at import), are shared with the forked workers
+   copy-on-write. The result cache is per worker.
+
 3. Open http://127.0.0.1:5000 in your browser.
 
 What it does (simple):
 - Has a small network of ports with lat/lon and adjacency
 - Takes user inputs: vessel capacity (tons), port handling costs (per-port override),
   origin, destination, delivery deadline (hours), vessel speed (km/h)
-- Enumerates simple paths from origin -> destination (depth-limited), computes
-  travel time and cost for each path, filters by deadline, and returns the
-  cheapest path meeting the deadline.
+- Enumerates simple paths from origin -> destination with a numba-compiled
+  DFS over a CSR adjacency, computes travel time and cost for each path,
+  filters by deadline, and returns the cheapest path meeting the deadline.
 - Shows result in a web dashboard and renders a map (Leaflet) with the route.
 
 Notes:
@@ -28,8 +37,13 @@ Notes:
   (mixed-integer programming, Clarke-Wright, VRP solvers, etc.)
 
 """
-from flask import Flask, request, render_template_string, jsonify
-import math
+from flask import Flask, Response, request, render_template
+import functools
+import heapq
+import numpy as np
+import orjson
+import re
+from numba import njit
 from itertools import permutations, islice
 
 app = Flask(__name__)
@@ -64,89 +78,240 @@ ADJ = {
 FUEL_PRICE_PER_KM = 0.12  # arbitrary currency per km (per capacity factor)
 BASE_HANDLING_COST = 500  # default per port handling cost
 DEFAULT_VESSEL_SPEED_KMH = 20  # average speed
+MAX_ROUTES_SHOWN = 50  # cheapest feasible paths returned per request
 
 # --------------- Utilities ----------------
 
-def haversine_km(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    c = 2*math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-
-def compute_edge_info(a, b):
-    pa = PORTS[a]
-    pb = PORTS[b]
-    dist = haversine_km(pa['lat'], pa['lon'], pb['lat'], pb['lon'])
-    # travel time in hours at default speed
-    time_h = dist / DEFAULT_VESSEL_SPEED_KMH
-    return {'distance_km': dist, 'time_h': time_h}
-
-# Precompute edges
-EDGES = {}
-for u, nbrs in ADJ.items():
-    for v in nbrs:
-        key = tuple(sorted((u, v)))
-        if key not in EDGES:
-            EDGES[key] = compute_edge_info(u, v)
-
-# --------------- Path enumeration + cost model ----------------
-
-def enumerate_simple_paths(graph, source, dest, max_hops=6):
-    # simple DFS (iterative) to enumerate simple paths up to max_hops edges
-    stack = [(source, [source])]
-    while stack:
-        (node, path) = stack.pop()
-        if len(path)-1 > max_hops:
+# Dense integer ids for ports, used to index the distance matrix
+PORT_IDX = {code: i for i, code in enumerate(PORTS)}
+
+# Port coordinates as structure-of-arrays, indexed by PORT_IDX
+LAT = np.array([p['lat'] for p in PORTS.values()], dtype=np.float64)
+LON = np.array([p['lon'] for p in PORTS.values()], dtype=np.float64)
+
+_RAD = 0.017453292519943295  # pi / 180
+
+def haversine_km_vec(i, j):
+    # great-circle distance between ports with id arrays i and j, which
+    # broadcast against each other (e.g. (N,1) vs (1,N) for all pairs)
+    lat1, lat2 = LAT[i], LAT[j]
+    dphi = (lat2 - lat1) * (_RAD * 0.5)
+    dlambda = (LON[j] - LON[i]) * (_RAD * 0.5)
+    a = np.sin(dphi)**2 + np.cos(lat1 * _RAD) * np.cos(lat2 * _RAD) * np.sin(dlambda)**2
+    return 12742.0 * np.arcsin(np.sqrt(a))  # 2 * 6371 km
+
+# Precompute the full symmetric distance matrix once, indexed by PORT_IDX
+_ids = np.arange(len(PORTS))
+DIST_KM = haversine_km_vec(_ids[:, None], _ids[None, :])
+
+# CSR-packed adjacency (by PORT_IDX) for the jitted search
+PORT_CODES = tuple(PORTS)
+INDPTR = np.zeros(len(PORTS) + 1, dtype=np.int32)
+INDICES = np.empty(sum(len(nbrs) for nbrs in ADJ.values()), dtype=np.int32)
+for code in PORT_CODES:
+    i = PORT_IDX[code]
+    nbrs = ADJ.get(code, [])
+    INDPTR[i+1] = INDPTR[i] + len(nbrs)
+    INDICES[INDPTR[i]:INDPTR[i+1]] = [PORT_IDX[v] for v in nbrs]
+
+# one bit per port id for the search's visited mask
+BIT = np.left_shift(np.uint64(1), np.arange(len(PORTS), dtype=np.uint64))
+
+def floyd_warshall(dist, indptr, indices):
+    # all-pairs shortest sailing distance over the (directed) ADJ edges;
+    # np.inf where no route exists
+    n = len(indptr) - 1
+    D = np.full((n, n), np.inf)
+    np.fill_diagonal(D, 0.0)
+    for i in range(n):
+        nbrs = indices[indptr[i]:indptr[i+1]]
+        D[i, nbrs] = dist[i, nbrs]
+    for k in range(n):
+        D = np.minimum(D, D[:, k, None] + D[None, k, :])
+    return D
+
+# Shortest remaining distance between any two ports. Sailing time and cost
+# both scale with distance, so this is an admissible lower bound for how much
+# any continuation of a partial path still has to add.
+DIST_SUM = floyd_warshall(DIST_KM, INDPTR, INDICES)
+
+# --------------- Path search + cost model ----------------
+
+@njit(cache=True)
+def search(indptr, indices, bit, dist, remaining, handling, origin, dest, max_hops, deadline, speed, fuel_km_scaled, k):
+    """Enumerate simple paths origin -> dest of at most max_hops edges that
+    meet the deadline. Iterative DFS over a fixed-size stack; the visited set
+    is a uint64 bitmask tested against the precomputed per-port bit table.
+    remaining[v, dest] (shortest distance v -> dest) bounds the time still to
+    sail, so branches that cannot make the deadline are cut before descending.
+
+    Branch-and-bound on cost: with k > 0 the search tracks the k cheapest
+    paths found so far and cuts any branch whose cost lower bound (cost so
+    far + shortest remaining sailing cost + handling at dest) exceeds the
+    k-th of them. The bound needs non-negative handling and fuel costs; pass
+    k <= 0 to disable it.
+
+    Returns (paths, lengths, costs, times): paths[i, :lengths[i]] holds the
+    port ids of the i-th emitted path, in DFS order. The k cheapest feasible
+    paths are always among them, but other paths may be emitted too.
+    """
+    cap = 64
+    out_paths = np.empty((cap, max_hops + 1), dtype=np.int32)
+    out_len = np.empty(cap, dtype=np.int32)
+    out_cost = np.empty(cap, dtype=np.float64)
+    out_time = np.empty(cap, dtype=np.float64)
+    count = 0
+    if origin == dest:
+        return out_paths[:0], out_len[:0], out_cost[:0], out_time[:0]
+
+    path = np.empty(max_hops + 1, dtype=np.int32)
+    cursor = np.empty(max_hops + 1, dtype=np.int32)
+    dist_acc = np.empty(max_hops + 1, dtype=np.float64)
+    handling_acc = np.empty(max_hops + 1, dtype=np.float64)
+    kbest = np.full(max(k, 1), np.inf)  # costs of the k cheapest paths so far
+    worst = 0  # index of the largest of them, i.e. the current cost bound
+    path[0] = origin
+    cursor[0] = indptr[origin]
+    dist_acc[0] = 0.0
+    handling_acc[0] = handling[origin]
+    visited = bit[origin]
+    depth = 0
+    while depth >= 0:
+        u = path[depth]
+        if depth == max_hops or cursor[depth] == indptr[u+1]:
+            # backtrack
+            visited ^= bit[u]
+            depth -= 1
+            continue
+        v = indices[cursor[depth]]
+        cursor[depth] += 1
+        nb_bit = bit[v]
+        if visited & nb_bit:
+            continue
+        d = dist_acc[depth] + dist[u, v]
+        if (d + remaining[v, dest]) / speed > deadline:
             continue
-        for nbr in graph.get(node, []):
-            if nbr in path:
+        t = d / speed
+        if v == dest:
+            c = handling_acc[depth] + handling[v] + d * fuel_km_scaled
+            if c > kbest[worst]:
                 continue
-            new_path = path + [nbr]
-            if nbr == dest:
-                yield new_path
-            else:
-                stack.append((nbr, new_path))
-
-
-def path_cost_and_time(path, vessel_capacity, port_handling_overrides, speed_kmh, fuel_price_per_km):
-    total_cost = 0.0
-    total_time = 0.0
-    # node handling costs (exclude origin for clarity if desired)
-    for node in path:
-        handling = port_handling_overrides.get(node, BASE_HANDLING_COST)
-        total_cost += handling
-    # edges
-    for i in range(len(path)-1):
-        a, b = path[i], path[i+1]
-        key = tuple(sorted((a, b)))
-        info = EDGES.get(key)
-        if not info:
-            # if no precomputed edge, compute direct
-            info = compute_edge_info(a, b)
-        dist = info['distance_km']
-        # cost scales mildly with vessel capacity (simplified)
-        capacity_factor = max(0.5, vessel_capacity / 1000.0)  # normalize
-        edge_cost = dist * fuel_price_per_km * capacity_factor
-        total_cost += edge_cost
-        # time uses chosen speed
-        edge_time = dist / speed_kmh
-        total_time += edge_time
-    return {'cost': round(total_cost, 2), 'time_h': round(total_time, 2)}
+            if count == cap:
+                cap *= 2
+                grown_paths = np.empty((cap, max_hops + 1), dtype=np.int32)
+                grown_paths[:count] = out_paths
+                out_paths = grown_paths
+                grown_len = np.empty(cap, dtype=np.int32)
+                grown_len[:count] = out_len
+                out_len = grown_len
+                grown_cost = np.empty(cap, dtype=np.float64)
+                grown_cost[:count] = out_cost
+                out_cost = grown_cost
+                grown_time = np.empty(cap, dtype=np.float64)
+                grown_time[:count] = out_time
+                out_time = grown_time
+            out_paths[count, :depth+1] = path[:depth+1]
+            out_paths[count, depth+1] = v
+            out_len[count] = depth + 2
+            out_cost[count] = c
+            out_time[count] = t
+            count += 1
+            if k > 0:
+                kbest[worst] = c
+                worst = np.argmax(kbest)
+            continue
+        lb = handling_acc[depth] + handling[v] + (d + remaining[v, dest]) * fuel_km_scaled + handling[dest]
+        if lb > kbest[worst]:
+            continue
+        depth += 1
+        path[depth] = v
+        cursor[depth] = indptr[v]
+        dist_acc[depth] = d
+        handling_acc[depth] = handling_acc[depth-1] + handling[v]
+        visited |= nb_bit
+    return out_paths[:count], out_len[:count], out_cost[:count], out_time[:count]
+
+
+@functools.lru_cache(maxsize=256)
+def _effective_handling(overrides_items):
+    # dense per-port handling cost array (by PORT_IDX) with the overrides
+    # applied; shared by every request with the same overrides, so read-only
+    handling = np.full(len(PORTS), BASE_HANDLING_COST, dtype=np.float64)
+    for code, val in overrides_items:
+        if code in PORT_IDX:
+            handling[PORT_IDX[code]] = val
+    handling.setflags(write=False)
+    return handling
+
+
+@functools.lru_cache(maxsize=4096)
+def _compute(origin, destination, capacity, speed, deadline, fuel_price, overrides_items):
+    # the port graph is static, so results depend only on these inputs;
+    # overrides_items is tuple(sorted(overrides.items())) to keep it hashable.
+    # Returns an immutable tuple of the cheapest MAX_ROUTES_SHOWN feasible
+    # paths as dicts in increasing cost order - callers must not mutate them
+    # since they are shared across requests.
+    if origin not in PORT_IDX or destination not in PORT_IDX:
+        return ()
+    o, dst = PORT_IDX[origin], PORT_IDX[destination]
+    if DIST_SUM[o, dst] / speed > deadline:
+        # unreachable (inf) or even the shortest route misses the deadline
+        return ()
+    handling = _effective_handling(overrides_items)
+    # cost scales mildly with vessel capacity (simplified)
+    capacity_factor = max(0.5, capacity / 1000.0)  # normalize
+    # fuel cost per km for this vessel, so a path's sailing cost is one multiply
+    fuel_km_scaled = fuel_price * capacity_factor
+    # cost pruning is only sound when no cost component can be negative
+    k = MAX_ROUTES_SHOWN if fuel_km_scaled >= 0 and handling.min() >= 0 else 0
+    paths, lengths, costs, times = search(INDPTR, INDICES, BIT, DIST_KM, DIST_SUM, handling,
+                                          o, dst, len(PORTS) - 1, deadline, speed, fuel_km_scaled, k)
+    # only the cheapest MAX_ROUTES_SHOWN are served, so select rather than sort
+    costs_list = costs.tolist()
+    top = heapq.nsmallest(MAX_ROUTES_SHOWN, range(len(costs_list)), key=costs_list.__getitem__)
+    candidates = []
+    times_list = times.tolist()
+    for i in top:
+        # tuples are only built for served paths, straight from the search's
+        # output rows as plain ints (no per-element NumPy scalar boxing)
+        ids = paths[i, :lengths[i]].tolist()
+        candidates.append({'path': tuple(map(PORT_CODES.__getitem__, ids)),
+                           'cost': round(costs_list[i], 2),
+                           'time_h': round(times_list[i], 2)})
+    return tuple(candidates)
+
+# Compile search() at import rather than on the first request: under gunicorn
+# --preload this happens once in the master and forked workers inherit the
+# compiled code. Argument types mirror _compute's call (read-only handling).
+search(INDPTR, INDICES, BIT, DIST_KM, DIST_SUM, _effective_handling(()), 0, 1, len(PORTS) - 1,
+       1e9, float(DEFAULT_VESSEL_SPEED_KMH), FUEL_PRICE_PER_KM, MAX_ROUTES_SHOWN)
 
 # --------------- Flask routes ----------------
 
+# PORTS never changes, so serialize it for the map script once
+PORTS_JS = orjson.dumps(PORTS).decode()
+
+class ORJSONResponse(Response):
+    default_mimetype = 'application/json'
+
+
+def jsonify(obj):
+    # orjson-backed stand-in for flask.jsonify (no indent/sort_keys pass)
+    return ORJSONResponse(orjson.dumps(obj))
+
+# CODE:cost entries in the comma-separated overrides form field, e.g.
+# "HKG:600, sin:7.5e2, SHA:-5". Each match must span a whole entry, so
+# malformed entries ("XSIN:700", "HKG:12abc") are skipped, not half-matched.
+_OV_RE = re.compile(r'(?:^|,)\s*([A-Za-z]{3})\s*:\s*'
+                    r'([+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)\s*(?=,|$)')
+
 INDEX_HTML = """
 <!doctype html>
 <html>
   <head>
     <meta charset="utf-8" />
     <title>Shipping Route Optimizer</title>
-    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
+    <link rel="stylesheet" href="{{ url_for('static', filename=LEAFLET_DIR + '/leaflet.css') }}" />
     <style>body{font-family: Arial, sans-serif; margin:20px} #map{height:400px; margin-top:10px}</style>
   </head>
   <body>
@@ -172,7 +337,7 @@ INDEX_HTML = """
       <h3>Best route (cost {{result.cost}} , time {{result.time_h}} h)</h3>
       <div>Path: {{result.path|join(' → ')}}</div>
       <div id="map"></div>
-      <h4>All feasible paths considered</h4>
+      <h4>Cheapest feasible paths considered</h4>
       <table border="1" cellpadding="6">
         <tr><th>Path</th><th>Cost</th><th>Time (h)</th></tr>
         {% for p in all %}
@@ -181,30 +346,53 @@ INDEX_HTML = """
       </table>
     {% endif %}
 
-    <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+    <script defer src="{{ url_for('static', filename=LEAFLET_DIR + '/leaflet.js') }}"></script>
     {% if result %}
     <script>
-      const path = {{result_js|safe}};
-      const ports = {{ports_js|safe}};
-      const map = L.map('map').setView([0,0], 2);
-      L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {maxZoom: 18}).addTo(map);
-      const latlngs = path.path.map(code => [ports[code].lat, ports[code].lon]);
-      const poly = L.polyline(latlngs, {weight:4}).addTo(map);
-      // markers
-      for (let i=0;i<path.path.length;i++){
-        const code = path.path[i];
-        L.marker([ports[code].lat, ports[code].lon]).addTo(map).bindPopup(code + ' — ' + ports[code].name);
-      }
-      map.fitBounds(poly.getBounds(), {padding:[40,40]});
+      // leaflet.js is deferred, so wait for it before touching L
+      document.addEventListener('DOMContentLoaded', () => {
+        const path = {{result_js|safe}};
+        const ports = {{ports_js|safe}};
+        const map = L.map('map').setView([0,0], 2);
+        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {maxZoom: 18}).addTo(map);
+        const latlngs = path.path.map(code => [ports[code].lat, ports[code].lon]);
+        const poly = L.polyline(latlngs, {weight:4}).addTo(map);
+        // markers
+        for (let i=0;i<path.path.length;i++){
+          const code = path.path[i];
+          L.marker([ports[code].lat, ports[code].lon]).addTo(map).bindPopup(code + ' — ' + ports[code].name);
+        }
+        map.fitBounds(poly.getBounds(), {padding:[40,40]});
+      });
     </script>
     {% endif %}
   </body>
 </html>
 """
 
+# Leaflet is served from static/ rather than a CDN; the directory is
+# versioned, so its files can be cached by browsers indefinitely
+LEAFLET_DIR = 'leaflet-1.9.3'
+
+@app.after_request
+def cache_vendored_assets(response):
+    # only successful responses: a cached 404 would stick around for a year
+    if (response.status_code in (200, 304) and request.endpoint == 'static'
+            and request.view_args['filename'].startswith(LEAFLET_DIR + '/')):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
+# Compile the template once through the app's Jinja environment (autoescape,
+# url_for and context processors still apply) instead of re-parsing it in
+# render_template_string on every request
+_INDEX_TMPL = app.jinja_env.from_string(INDEX_HTML, globals={'LEAFLET_DIR': LEAFLET_DIR})
+
 @app.route('/', methods=['GET'])
 def index():
-    return render_template_string(INDEX_HTML, ports=PORTS, result=None)
+    return render_template(_INDEX_TMPL, ports=PORTS, result=None)
 
 @app.route('/optimize', methods=['POST'])
 def optimize():
@@ -214,34 +402,17 @@ def optimize():
     speed = float(request.form.get('speed', DEFAULT_VESSEL_SPEED_KMH))
     deadline = float(request.form.get('deadline', 1e9))
     fuel_price = float(request.form.get('fuel_price', FUEL_PRICE_PER_KM))
-    overrides_raw = request.form.get('overrides','').strip()
-    overrides = {}
-    if overrides_raw:
-        try:
-            for part in overrides_raw.split(','):
-                k,v = part.split(':')
-                overrides[k.strip().upper()] = float(v)
-        except Exception:
-            pass
-
-    # enumerate paths
-    candidates = []
-    for path in enumerate_simple_paths(ADJ, origin, destination, max_hops=6):
-        info = path_cost_and_time(path, capacity, overrides, speed, fuel_price)
-        # enforce deadline
-        if info['time_h'] <= deadline:
-            candidates.append({'path': path, 'cost': info['cost'], 'time_h': info['time_h']})
+    overrides_raw = request.form.get('overrides', '')
+    overrides = {k.upper(): float(v) for k, v in _OV_RE.findall(overrides_raw)}
 
-    # sort by cost
-    candidates_sorted = sorted(candidates, key=lambda x: x['cost'])
-    best = candidates_sorted[0] if candidates_sorted else None
+    candidates = _compute(origin, destination, capacity, speed, deadline, fuel_price,
+                          tuple(sorted(overrides.items())))
+    best = candidates[0] if candidates else None
 
     # Prepare JS-safe objects
-    import json
-    result_js = json.dumps(best) if best else 'null'
-    ports_js = json.dumps(PORTS)
+    result_js = orjson.dumps(best).decode() if best else 'null'
 
-    return render_template_string(INDEX_HTML, ports=PORTS, result=best, all=candidates_sorted, result_js=result_js, ports_js=ports_js)
+    return render_template(_INDEX_TMPL, ports=PORTS, result=best, all=candidates, result_js=result_js, ports_js=PORTS_JS)
 
 # Simple API endpoint too
 @app.route('/api/optimize', methods=['POST'])
@@ -258,14 +429,11 @@ def api_optimize():
     if origin not in PORTS or destination not in PORTS:
         return jsonify({'error': 'invalid ports'}), 400
 
-    candidates = []
-    for path in enumerate_simple_paths(ADJ, origin, destination, max_hops=6):
-        info = path_cost_and_time(path, capacity, overrides, speed, fuel_price)
-        if info['time_h'] <= deadline:
-            candidates.append({'path': path, 'cost': info['cost'], 'time_h': info['time_h']})
-    candidates_sorted = sorted(candidates, key=lambda x: x['cost'])
-    best = candidates_sorted[0] if candidates_sorted else None
-    return jsonify({'best': best, 'all': candidates_sorted})
+    candidates = _compute(origin, destination, capacity, speed, deadline, fuel_price,
+                          tuple(sorted(overrides.items())))
+    best = candidates[0] if candidates else None
+    return jsonify({'best': best, 'all': candidates})
 
 if __name__ == '__main__':
+    # dev server only; use gunicorn (see module docstring) for real load
     app.run(debug=True)
@@ -0,0 +1,100 @@
+import pytest
+
+import flask_shipping_optimizer as opt
+
+
+def parse_overrides(raw):
+    return {k.upper(): float(v) for k, v in opt._OV_RE.findall(raw)}
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('', {}),
+    ('HKG:600,SIN:700', {'HKG': 600.0, 'SIN': 700.0}),
+    (' hkg : 600 , sin:700.5 ', {'HKG': 600.0, 'SIN': 700.5}),
+    ('HKG:1e3', {'HKG': 1000.0}),
+    ('HKG:1.5E-1,SIN:.5', {'HKG': 0.15, 'SIN': 0.5}),
+    ('SHA:-5', {'SHA': -5.0}),
+    # malformed entries are skipped, the rest still apply
+    ('XSIN:700,HKG:1', {'HKG': 1.0}),
+    ('LAXX:5', {}),
+    ('HKG:12abc,SIN:3', {'SIN': 3.0}),
+    ('bad,,SHA:2', {'SHA': 2.0}),
+])
+def test_override_parsing(raw, expected):
+    assert parse_overrides(raw) == expected
+
+
+def test_vendored_assets_cached_only_when_found():
+    client = opt.app.test_client()
+    ok = client.get(f'/static/{opt.LEAFLET_DIR}/leaflet.js')
+    assert ok.status_code == 200
+    assert ok.cache_control.immutable and ok.cache_control.max_age == 31536000
+    missing = client.get(f'/static/{opt.LEAFLET_DIR}/nope.js')
+    assert missing.status_code == 404
+    assert not missing.cache_control.immutable and missing.cache_control.max_age is None
+
+
+def brute_force_routes(origin, destination, capacity, speed, deadline, fuel_price, overrides):
+    # every simple path over ADJ, costed independently of search()'s bounds
+    capacity_factor = max(0.5, capacity / 1000.0)
+    routes = []
+
+    def dfs(path):
+        node = path[-1]
+        for nbr in opt.ADJ.get(node, []):
+            if nbr in path:
+                continue
+            if nbr == destination:
+                full = path + [nbr]
+                dist = sum(opt.DIST_KM[opt.PORT_IDX[a], opt.PORT_IDX[b]]
+                           for a, b in zip(full, full[1:]))
+                cost = sum(overrides.get(c, opt.BASE_HANDLING_COST) for c in full)
+                cost += dist * fuel_price * capacity_factor
+                if dist / speed <= deadline:
+                    routes.append((tuple(full), cost, dist / speed))
+            else:
+                dfs(path + [nbr])
+
+    if origin != destination:
+        dfs([origin])
+    return sorted(routes, key=lambda r: r[1])
+
+
+PAIRS = [(o, d) for o in opt.PORTS for d in opt.PORTS]
+OVERRIDES = [(), (('HKG', 50.0), ('SHA', 2000.0)), (('SHA', -5.0),)]
+
+
+@pytest.fixture
+def fresh_cache():
+    opt._compute.cache_clear()
+    yield
+    opt._compute.cache_clear()
+
+
+@pytest.mark.parametrize('overrides_items', OVERRIDES)
+@pytest.mark.parametrize('deadline', [1e9, 3000.0, 1100.0, 600.0])
+def test_compute_matches_brute_force(fresh_cache, deadline, overrides_items):
+    for origin, destination in PAIRS:
+        expected = brute_force_routes(origin, destination, 1500.0, 25.0, deadline, 0.12,
+                                      dict(overrides_items))
+        got = opt._compute(origin, destination, 1500.0, 25.0, deadline, 0.12, overrides_items)
+        assert len(got) == len(expected)
+        costs = [r['cost'] for r in got]
+        assert costs == sorted(costs)
+        by_path = {path: (cost, time_h) for path, cost, time_h in expected}
+        for r in got:
+            cost, time_h = by_path[r['path']]
+            assert r['cost'] == pytest.approx(cost, abs=0.006)
+            assert r['time_h'] == pytest.approx(time_h, abs=0.006)
+
+
+@pytest.mark.parametrize('overrides_items', OVERRIDES)
+@pytest.mark.parametrize('deadline', [1e9, 1100.0])
+def test_cost_pruning_keeps_the_k_cheapest(fresh_cache, monkeypatch, deadline, overrides_items):
+    # a small k makes the branch-and-bound actually cut branches
+    monkeypatch.setattr(opt, 'MAX_ROUTES_SHOWN', 3)
+    for origin, destination in PAIRS:
+        expected = brute_force_routes(origin, destination, 1500.0, 25.0, deadline, 0.12,
+                                      dict(overrides_items))[:3]
+        got = opt._compute(origin, destination, 1500.0, 25.0, deadline, 0.12, overrides_items)
+        assert [r['cost'] for r in got] == pytest.approx([c for _, c, _ in expected], abs=0.006)